@@ -0,0 +1,102 @@
+from fastapi import Form, APIRouter, HTTPException
+
+from ..config import logger
+from ..core import worker_pool, scheduler
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def _swap_result(model_name, versions, errors):
+    result = {"model": model_name, "versions": versions}
+    if errors:
+        result["errors"] = {worker_id: str(e) for worker_id, e in errors.items()}
+    return result
+
+
+@router.get("/models")
+async def loaded_models():
+    """
+    List the models currently loaded, with their live version and in-flight requests.
+    """
+    workers = await worker_pool.status()
+    return {
+        "models": [
+            {"worker_id": worker["worker_id"], **session}
+            for worker in workers
+            for session in worker.get("sessions", [])
+        ]
+    }
+
+
+@router.post("/models/reload")
+async def reload_model(model_name: str = Form(...)):
+    """
+    Build and warm a new session from the model file, then swap it in.
+    Requests already running finish on the previous version.
+    """
+    try:
+        versions, errors = await worker_pool.reload(model_name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Model {model_name} not found")
+    except Exception as e:
+        logger.error(f"Reload of {model_name} failed: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return _swap_result(model_name, versions, errors)
+
+
+@router.post("/models/rollback")
+async def rollback_model(model_name: str = Form(...)):
+    """
+    Swap back to the version that was live before the last reload.
+    Refused unless every worker serving the model has a version to roll back to.
+    """
+    try:
+        versions, errors = await worker_pool.rollback(model_name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Model {model_name} not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return _swap_result(model_name, versions, errors)
+
+
+@router.get("/workers")
+async def workers():
+    """
+    Report each inference worker with its resident models and memory usage.
+    """
+    return {"replicas": worker_pool.replicas, "workers": await worker_pool.status()}
+
+
+@router.post("/workers")
+async def add_worker():
+    """
+    Start a new inference worker and move the models it now owns onto it.
+    """
+    if worker_pool.local:
+        raise HTTPException(status_code=400, detail="Inference runs in-process")
+    return {"worker_id": await worker_pool.add_worker()}
+
+
+@router.delete("/workers/{worker_id}")
+async def remove_worker(worker_id: int):
+    """
+    Move a worker's models to their new owners, then stop it.
+    """
+    try:
+        await worker_pool.remove_worker(worker_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Worker {worker_id} not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"worker_id": worker_id, "status": "removed"}
+
+
+@router.get("/scheduler")
+async def scheduler_status():
+    """
+    Report each scheduler lane with its weight, queue depth and queue latency.
+    """
+    return scheduler.status()
@@ -1,36 +1,86 @@
 import json
 
-from fastapi import Form, UploadFile, File, APIRouter, HTTPException
+from fastapi import Form, UploadFile, File, Header, APIRouter, HTTPException
 
 from ..config import ASSETS_DIR
-from ..inference import content_to_class
+from ..core import worker_pool, scheduler, resolve_priority
+from ..core.negotiation import JSON, negotiate, tensor_response
+from ..inference import resolve_model_path
+from ..inference.postprocess import build_label_table, lookup_labels
 
 router = APIRouter(prefix="/predict", tags=["predict"])
 
 with open(ASSETS_DIR / "idx_to_label" / "imagenet.json") as f:
     IMAGNET_MAPPING = json.load(f)
 
+IMAGENET_LABELS = build_label_table(IMAGNET_MAPPING)
+
+
+def top_k_results(indices, scores):
+    """Pair the labels and scores of each row, best class first."""
+    labels = lookup_labels(IMAGENET_LABELS, indices)
+    return [
+        [
+            {"label": label, "score": score}
+            for label, score in zip(row_labels, row_scores)
+        ]
+        for row_labels, row_scores in zip(labels.tolist(), scores.tolist())
+    ]
+
 
 @router.post("/")
 async def predict(
     model_name: str = Form(...),
     input_data: UploadFile = File(...),
+    top_k: int = Form(1),
+    softmax: bool = Form(True),
+    x_priority: str | None = Header(None),
+    accept: str | None = Header(None),
 ):
+    """
+    Predict the top-k classes of a single image, with softmax scores by default.
+    Send `Accept: application/msgpack`, `application/x-npy` or
+    `application/octet-stream` to get the raw output tensor instead.
+    """
+    media_type = negotiate(accept)
     content = await input_data.read()
 
     try:
-        class_idx = content_to_class(content, model_name)
-        class_label = IMAGNET_MAPPING.get(str(class_idx), "Unknown")
+        # Before submitting, so unknown names never get a scheduler lane
+        resolve_model_path(model_name)
+        priority = resolve_priority(model_name, x_priority)
+        if media_type != JSON:
+            encoded = await scheduler.submit(
+                model_name,
+                priority,
+                worker_pool.output,
+                model_name,
+                [content],
+                media_type,
+            )
+            return tensor_response(encoded, media_type)
+
+        indices, scores = await scheduler.submit(
+            model_name,
+            priority,
+            worker_pool.top_k,
+            model_name,
+            [content],
+            top_k,
+            softmax,
+        )
     except FileNotFoundError:
         raise HTTPException(status_code=400, detail=f"Model {model_name} not found")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    predictions = top_k_results(indices, scores)[0]
     return {
         "model": model_name,
         "filename": input_data.filename,
         "size": len(content),
-        "class": class_label,
+        "class": predictions[0]["label"],
+        "top_k": predictions,
     }
 
 
@@ -38,8 +88,58 @@ async def predict(
 async def predict_batch(
     model_name: str = Form(...),
     input_files: list[UploadFile] = File(...),
+    top_k: int = Form(1),
+    softmax: bool = Form(True),
+    x_priority: str | None = Header(None),
+    accept: str | None = Header(None),
 ):
+    """
+    Predict on several images in one batched inference.
+    Binary encodings return the outputs stacked into a single (N, ...) tensor.
+    """
+    media_type = negotiate(accept)
+    contents = [await input_file.read() for input_file in input_files]
+
+    try:
+        # Before submitting, so unknown names never get a scheduler lane
+        resolve_model_path(model_name)
+        priority = resolve_priority(model_name, x_priority)
+        if media_type != JSON:
+            encoded = await scheduler.submit(
+                model_name,
+                priority,
+                worker_pool.output,
+                model_name,
+                contents,
+                media_type,
+            )
+            return tensor_response(encoded, media_type)
+
+        indices, scores = await scheduler.submit(
+            model_name,
+            priority,
+            worker_pool.top_k,
+            model_name,
+            contents,
+            top_k,
+            softmax,
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=400, detail=f"Model {model_name} not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     results = []
-    for input_file in input_files:
-        results.append(await predict(model_name, input_file))
+    for input_file, content, predictions in zip(
+        input_files, contents, top_k_results(indices, scores)
+    ):
+        results.append(
+            {
+                "model": model_name,
+                "filename": input_file.filename,
+                "size": len(content),
+                "class": predictions[0]["label"],
+                "top_k": predictions,
+            }
+        )
     return {"results": results}
@@ -148,4 +148,49 @@ logger.info(f"PROJ_ROOT path is: {PROJ_ROOT}")
 logger.info(f"LOGS_DIR path is: {LOGS_DIR}")
 logger.info(f"MODELS_DIR path is: {MODELS_DIR}")
 
+# Inference worker processes spawned by the API, 0 runs inference in the API
+# process. Not uvicorn workers: the app must run as a single uvicorn process
 NUM_WORKERS = int(os.getenv("NUM_WORKERS", 2))
+# Number of workers each model is resident in
+MODEL_REPLICAS = int(os.getenv("MODEL_REPLICAS", 1))
+
+# Seconds between checks for updated model files, 0 disables the watcher
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", 5))
+
+# Batch sizes to preallocate inference buffers for, e.g. "1,8,32"
+INFERENCE_BATCH_SIZES = [
+    int(size) for size in os.getenv("INFERENCE_BATCH_SIZES", "1").split(",")
+]
+
+
+def _parse_priority_weights(spec):
+    """
+    Parse "name:weight,..." into a dict of priority weights.
+
+    Raises:
+        ValueError: If an entry is malformed or a weight is not a positive number.
+    """
+    weights = {}
+    for entry in spec.split(","):
+        name, _, weight = entry.partition(":")
+        name = name.strip().lower()
+        try:
+            weight = float(weight)
+        except ValueError:
+            name = None
+        if not name:
+            raise ValueError(f"Malformed PRIORITY_WEIGHTS entry {entry!r}")
+        if not 0 < weight < float("inf"):
+            raise ValueError(
+                f"PRIORITY_WEIGHTS weight of {name} must be a positive number"
+            )
+        weights[name] = weight
+    return weights
+
+
+# Scheduler lane weight per priority, e.g. "high:8,normal:4,low:1"
+PRIORITY_WEIGHTS = _parse_priority_weights(
+    os.getenv("PRIORITY_WEIGHTS", "high:8,normal:4,low:1")
+)
+# Inference jobs the scheduler lets run at once
+SCHEDULER_CONCURRENCY = int(os.getenv("SCHEDULER_CONCURRENCY", max(NUM_WORKERS, 1) * 2))
@@ -1 +1,3 @@
-from .middleware import RequestLoggingMiddleware
+from .middleware import RequestLoggingMiddleware
+from .routing import HashRing, WorkerPool, worker_pool
+from .scheduler import Scheduler, resolve_priority, scheduler
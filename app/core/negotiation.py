@@ -0,0 +1,64 @@
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from ..inference import TENSOR_ENCODERS
+
+JSON = "application/json"
+
+MEDIA_TYPE_ALIASES = {
+    "application/x-msgpack": "application/msgpack",
+    "application/npy": "application/x-npy",
+}
+
+
+def negotiate(accept):
+    """
+    Pick the response media type from an `Accept` header, honouring q-values.
+    JSON is the default when no header is sent or anything is accepted.
+
+    Returns:
+        str: "application/json" or one of TENSOR_ENCODERS.
+
+    Raises:
+        HTTPException: 406 if none of the accepted types can be produced.
+    """
+    if not accept:
+        return JSON
+
+    candidates = []
+    for position, entry in enumerate(accept.split(",")):
+        media_type, *params = [part.strip() for part in entry.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            candidates.append((-quality, position, media_type.lower()))
+
+    for _, _, media_type in sorted(candidates):
+        media_type = MEDIA_TYPE_ALIASES.get(media_type, media_type)
+        if media_type in (JSON, "*/*", "application/*"):
+            return JSON
+        if media_type in TENSOR_ENCODERS:
+            return media_type
+
+    raise HTTPException(
+        status_code=406,
+        detail=f"Cannot produce {accept}, supported: {[JSON, *TENSOR_ENCODERS]}",
+    )
+
+
+def tensor_response(encoded, media_type):
+    """Wrap an encoded output tensor, with its shape and dtype in headers."""
+    body, shape, dtype = encoded
+    return Response(
+        content=body,
+        media_type=media_type,
+        headers={
+            "X-Tensor-Shape": ",".join(str(dim) for dim in shape),
+            "X-Tensor-Dtype": dtype,
+        },
+    )
@@ -0,0 +1,598 @@
+import os
+import asyncio
+import bisect
+import hashlib
+import resource
+import threading
+import multiprocessing as mp
+
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where the single-process check is skipped
+    fcntl = None
+
+from ..config import (
+    logger,
+    LOGS_DIR,
+    MODELS_DIR,
+    NUM_WORKERS,
+    MODEL_REPLICAS,
+    MODEL_WATCH_INTERVAL,
+)
+from ..inference import (
+    canonical_model_name,
+    contents_to_output,
+    contents_to_top_k,
+    resolve_model_path,
+    session_manager,
+    sibling_versions,
+)
+
+
+def _hash(key):
+    # md5 rather than hash() so placement is stable across processes and restarts
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping model names to worker ids.
+
+    Each worker is placed on the ring at several virtual points so that adding
+    or removing a worker only moves the models adjacent to its points.
+    """
+
+    def __init__(self, virtual_nodes=64):
+        self.virtual_nodes = virtual_nodes
+        self._points = []
+        self._owners = {}
+
+    def add(self, worker_id):
+        for i in range(self.virtual_nodes):
+            point = _hash(f"{worker_id}:{i}")
+            self._owners[point] = worker_id
+            bisect.insort(self._points, point)
+
+    def remove(self, worker_id):
+        self._points = [p for p in self._points if self._owners[p] != worker_id]
+        self._owners = {p: w for p, w in self._owners.items() if w != worker_id}
+
+    def lookup(self, key, count=1):
+        """
+        Return up to `count` distinct workers for `key`, walking clockwise
+        from the key's position on the ring.
+        """
+        if not self._points:
+            return []
+
+        workers = []
+        start = bisect.bisect(self._points, _hash(key))
+        for i in range(len(self._points)):
+            worker_id = self._owners[self._points[(start + i) % len(self._points)]]
+            if worker_id not in workers:
+                workers.append(worker_id)
+                if len(workers) == count:
+                    break
+        return workers
+
+
+def _resident_memory():
+    """Current resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Not Linux: fall back to the peak RSS, reported in KiB
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _lock_api_process(lock_path):
+    """
+    Hold an exclusive lock on `lock_path` for the life of this process, so a
+    second API process (e.g. `uvicorn --workers 2`) fails instead of starting
+    its own inference workers and its own copy of every model.
+
+    Raises:
+        RuntimeError: If another API process already holds the lock.
+    """
+    if fcntl is None:
+        return None
+
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    # Append mode, so a refused process does not erase the holder's pid
+    lock_file = open(lock_path, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        raise RuntimeError(
+            f"Another API process holds {lock_path}. Run a single uvicorn process "
+            "and scale inference with NUM_WORKERS instead of --workers."
+        )
+    lock_file.truncate(0)
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    return lock_file
+
+
+def _model_key(model_name):
+    # Same key as resolve_model_path, without requiring the file to still exist
+    return MODELS_DIR / Path(model_name)
+
+
+def _load(model_name):
+    with session_manager.acquire(resolve_model_path(model_name)):
+        pass
+
+
+def _unload(model_name):
+    session_manager.unload(_model_key(model_name))
+
+
+def _export(model_name):
+    return session_manager.export(_model_key(model_name))
+
+
+def _adopt(model_name, exported):
+    return session_manager.adopt(_model_key(model_name), exported)
+
+
+def _can_rollback(model_name):
+    return session_manager.can_rollback(_model_key(model_name))
+
+
+def _reload(model_name):
+    return session_manager.reload(resolve_model_path(model_name))
+
+
+def _rollback(model_name):
+    return session_manager.rollback(resolve_model_path(model_name))
+
+
+def _status():
+    return {
+        "pid": os.getpid(),
+        "memory_bytes": _resident_memory(),
+        "sessions": session_manager.status(),
+    }
+
+
+WORKER_OPS = {
+    "top_k": contents_to_top_k,
+    "output": contents_to_output,
+    "load": _load,
+    "unload": _unload,
+    "export": _export,
+    "adopt": _adopt,
+    "can_rollback": _can_rollback,
+    "reload": _reload,
+    "rollback": _rollback,
+    "status": _status,
+}
+
+
+def _worker_main(worker_id, conn, watch_interval):
+    """Serve ops from the pipe until told to stop. Runs in the worker process."""
+    logger.info(f"Inference worker {worker_id} started (pid {os.getpid()})")
+    if watch_interval > 0:
+        session_manager.start_watcher(watch_interval)
+
+    while True:
+        try:
+            op, args = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if op == "stop":
+            break
+
+        try:
+            conn.send(("ok", WORKER_OPS[op](*args)))
+        except Exception as e:
+            conn.send(("error", e))
+
+    session_manager.stop_watcher()
+    logger.info(f"Inference worker {worker_id} stopped")
+
+
+class WorkerGone(RuntimeError):
+    """Raised when a worker process has exited and its pipe is closed."""
+
+
+class Worker:
+    """
+    Handle on an inference worker process.
+    Calls are sent over a pipe and handled one at a time by the worker.
+    """
+
+    def __init__(self, worker_id, watch_interval):
+        self.worker_id = worker_id
+        self.models = set()
+        self.in_flight = 0
+
+        # spawn so workers never inherit ONNX Runtime thread pools from the parent
+        ctx = mp.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self._lock = threading.Lock()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(worker_id, child_conn, watch_interval),
+            name=f"inference-worker-{worker_id}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def call(self, op, *args):
+        with self._lock:
+            try:
+                self._conn.send((op, args))
+                status, result = self._conn.recv()
+            except (EOFError, OSError) as e:
+                raise WorkerGone(f"Inference worker {self.worker_id} is gone") from e
+        if status == "error":
+            raise result
+        return result
+
+    def stop(self, timeout=5):
+        try:
+            with self._lock:
+                self._conn.send(("stop", ()))
+        except OSError:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self._conn.close()
+
+
+class WorkerPool:
+    """
+    Routes inference to worker processes by model affinity.
+
+    Each model name is hashed onto a consistent ring and served by `replicas`
+    workers only, so a model's session is resident in those workers rather
+    than in every process. With no workers, inference runs in this process.
+
+    Names are normalised with `canonical_model_name` before they are hashed
+    or tracked, so every spelling of a model routes to the same workers.
+
+    Every `watch_interval` seconds, version directories that appear next to a
+    loaded model (e.g. .../v2/model.onnx beside .../v1/model.onnx) are built
+    and warmed on their owners, so their first request does not load them.
+    """
+
+    def __init__(self, num_workers, replicas=1, watch_interval=0):
+        self.num_workers = num_workers
+        self.replicas = replicas
+        self.watch_interval = watch_interval
+
+        self._ring = HashRing()
+        self._workers = {}
+        self._next_id = 0
+        self._membership_lock = asyncio.Lock()
+        self._process_lock = None
+
+        self._watch_task = None
+        # Versions on disk when each loaded model was first seen by the watcher
+        self._known_versions = {}
+
+    @property
+    def local(self):
+        return self.num_workers <= 0
+
+    def start(self):
+        # Model state and admin swaps live in this process, so there must be one
+        self._process_lock = _lock_api_process(Path(LOGS_DIR) / "api.lock")
+        if self.local:
+            if self.watch_interval > 0:
+                session_manager.start_watcher(self.watch_interval)
+        else:
+            for _ in range(self.num_workers):
+                self._spawn()
+            logger.info(
+                f"Started {self.num_workers} inference workers, "
+                f"{self.replicas} per model"
+            )
+
+        if self.watch_interval > 0:
+            # Called from the app lifespan, so the event loop is running
+            self._watch_task = asyncio.get_running_loop().create_task(
+                self._watch_new_versions()
+            )
+
+    def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+        session_manager.stop_watcher()
+        for worker in self._workers.values():
+            worker.stop()
+        self._workers.clear()
+        self._ring = HashRing()
+        if self._process_lock is not None:
+            self._process_lock.close()
+            self._process_lock = None
+
+    def _spawn(self):
+        worker_id = self._next_id
+        self._next_id += 1
+        self._workers[worker_id] = Worker(worker_id, self.watch_interval)
+        self._ring.add(worker_id)
+        return worker_id
+
+    def owners(self, model_name):
+        return self._ring.lookup(model_name, self.replicas)
+
+    async def _call(self, worker, op, *args):
+        worker.in_flight += 1
+        try:
+            return await asyncio.to_thread(worker.call, op, *args)
+        finally:
+            worker.in_flight -= 1
+
+    async def _route(self, op, model_name, *args):
+        if self.local:
+            return await asyncio.to_thread(WORKER_OPS[op], *args)
+
+        for _ in range(2):
+            owners = [self._workers[w] for w in self.owners(model_name)]
+            worker = min(owners, key=lambda w: w.in_flight)
+            try:
+                result = await self._call(worker, op, *args)
+            except WorkerGone:
+                # Replace the dead worker and retry once on the new owner
+                await self._replace(worker.worker_id)
+                continue
+            worker.models.add(model_name)
+            return result
+
+        raise RuntimeError(f"No inference worker available for {model_name}")
+
+    async def top_k(self, model_name, contents, k=1, softmax=False):
+        """Top-k (indices, scores) of each item in a batch."""
+        model_name = canonical_model_name(model_name)
+        return await self._route("top_k", model_name, contents, model_name, k, softmax)
+
+    async def output(self, model_name, contents, media_type=None):
+        """Stacked raw output for a batch, encoded for `media_type` if given."""
+        model_name = canonical_model_name(model_name)
+        return await self._route("output", model_name, contents, model_name, media_type)
+
+    async def _broadcast(self, op, model_name):
+        """
+        Apply `op` to every worker holding the model, or to its owners if none
+        do yet. A rollback is refused unless every target has a previous
+        version, so replicas are never left on different versions by it.
+
+        Returns:
+            tuple: The new version keyed by worker id, and the error of every
+                worker the op failed on.
+
+        Raises:
+            Exception: The first worker's error if the op failed everywhere.
+        """
+        model_name = canonical_model_name(model_name)
+        if self.local:
+            return {"local": await asyncio.to_thread(WORKER_OPS[op], model_name)}, {}
+
+        targets = [w for w in self._workers.values() if model_name in w.models]
+        if not targets:
+            targets = [self._workers[w] for w in self.owners(model_name)]
+
+        if op == "rollback":
+            ready = await asyncio.gather(
+                *(self._call(w, "can_rollback", model_name) for w in targets)
+            )
+            missing = [w.worker_id for w, ok in zip(targets, ready) if not ok]
+            if missing:
+                raise ValueError(
+                    f"No previous version of {model_name} to roll back to "
+                    f"on workers {missing}"
+                )
+
+        results = await asyncio.gather(
+            *(self._call(w, op, model_name) for w in targets), return_exceptions=True
+        )
+        versions, errors = {}, {}
+        for worker, result in zip(targets, results):
+            if isinstance(result, Exception):
+                logger.error(
+                    f"{op} of {model_name} failed on {worker.worker_id}: {result}"
+                )
+                errors[worker.worker_id] = result
+                continue
+            worker.models.add(model_name)
+            versions[worker.worker_id] = result
+
+        if not versions:
+            raise next(iter(errors.values()))
+        return versions, errors
+
+    async def reload(self, model_name):
+        return await self._broadcast("reload", model_name)
+
+    async def rollback(self, model_name):
+        return await self._broadcast("rollback", model_name)
+
+    def _loaded_models(self):
+        if self.local:
+            return {
+                canonical_model_name(os.path.relpath(s["model_path"], MODELS_DIR))
+                for s in session_manager.status()
+            }
+        return set().union(*(w.models for w in self._workers.values()))
+
+    def _new_versions(self, loaded):
+        """
+        Versions of the `loaded` models that appeared on disk since each was
+        first seen. Runs in a thread, as it scans the models directory.
+        """
+        new = set()
+        for model_name in loaded:
+            versions = set(sibling_versions(model_name))
+            known = self._known_versions.setdefault(model_name, versions)
+            new |= versions - known
+            known |= versions
+        return new - loaded
+
+    async def _warm(self, model_name):
+        if self.local:
+            await asyncio.to_thread(_load, model_name)
+            return
+
+        async with self._membership_lock:
+            for owner_id in self.owners(model_name):
+                owner = self._workers[owner_id]
+                await self._call(owner, "load", model_name)
+                owner.models.add(model_name)
+
+    async def warm_new_versions(self):
+        """
+        Build and warm every new version of a loaded model on its owners.
+
+        Returns:
+            list: The names of the versions warmed.
+        """
+        warmed = []
+        new = await asyncio.to_thread(self._new_versions, self._loaded_models())
+        for model_name in sorted(new):
+            logger.info(f"Detected new model version {model_name}, warming it")
+            try:
+                await self._warm(model_name)
+            except Exception as e:
+                logger.error(f"Failed to warm {model_name}: {e}")
+                continue
+            warmed.append(model_name)
+        return warmed
+
+    async def _watch_new_versions(self):
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            try:
+                await self.warm_new_versions()
+            except Exception as e:
+                logger.error(f"Failed to check for new model versions: {e}")
+
+    async def _warm_owners(self, model_name, exported=None):
+        """
+        Load a model on each of its owners that does not hold it yet, adopting
+        the version in `exported` if given rather than the file on disk.
+        """
+        for owner_id in self.owners(model_name):
+            owner = self._workers[owner_id]
+            if model_name in owner.models:
+                continue
+            try:
+                if exported is None:
+                    await self._call(owner, "load", model_name)
+                else:
+                    await self._call(owner, "adopt", model_name, exported)
+                owner.models.add(model_name)
+            except Exception as e:
+                logger.error(f"Failed to load {model_name} on {owner_id}: {e}")
+
+    async def _rebalance(self):
+        """
+        Move every model whose owners changed: warm it on the new owners first,
+        then unload it from workers that no longer own it.
+        """
+        for worker in list(self._workers.values()):
+            for model_name in list(worker.models):
+                if worker.worker_id in self.owners(model_name):
+                    continue
+
+                # Carry the live version and its rollback target over, so a
+                # rolled-back model does not revert to the file on disk
+                try:
+                    exported = await self._call(worker, "export", model_name)
+                except WorkerGone:
+                    exported = None
+                await self._warm_owners(model_name, exported)
+
+                try:
+                    await self._call(worker, "unload", model_name)
+                except WorkerGone:
+                    pass
+                worker.models.discard(model_name)
+
+    async def add_worker(self):
+        async with self._membership_lock:
+            worker_id = self._spawn()
+            self.num_workers = len(self._workers)
+            await self._rebalance()
+        logger.info(f"Inference worker {worker_id} joined")
+        return worker_id
+
+    async def remove_worker(self, worker_id):
+        async with self._membership_lock:
+            if worker_id not in self._workers:
+                raise KeyError(worker_id)
+            if len(self._workers) == 1:
+                raise ValueError("Cannot remove the last inference worker")
+
+            # Take it off the ring first so its models are warmed elsewhere
+            self._ring.remove(worker_id)
+            await self._rebalance()
+            worker = self._workers.pop(worker_id)
+            self.num_workers = len(self._workers)
+        await asyncio.to_thread(worker.stop)
+        logger.info(f"Inference worker {worker_id} left")
+
+    async def _replace(self, worker_id):
+        """
+        Replace a dead worker and warm its models on their new owners. A model
+        is copied from a surviving replica if there is one, else it is loaded
+        from disk and its rolled-back version and rollback target are lost.
+        """
+        async with self._membership_lock:
+            worker = self._workers.pop(worker_id, None)
+            if worker is None:
+                # Already replaced by a concurrent request
+                return
+            logger.error(f"Inference worker {worker_id} died, replacing it")
+            self._ring.remove(worker_id)
+            self._spawn()
+            await self._rebalance()
+
+            for model_name in sorted(worker.models):
+                exported = None
+                for holder in self._workers.values():
+                    if model_name not in holder.models:
+                        continue
+                    try:
+                        exported = await self._call(holder, "export", model_name)
+                    except WorkerGone:
+                        continue
+                    if exported is not None:
+                        break
+                if exported is None:
+                    logger.warning(
+                        f"Loading {model_name} from disk, its live version and "
+                        f"rollback state were lost with worker {worker_id}"
+                    )
+                await self._warm_owners(model_name, exported)
+        await asyncio.to_thread(worker.stop, 0)
+
+    async def status(self):
+        if self.local:
+            return [{"worker_id": "local", "alive": True, **_status()}]
+
+        workers = []
+        for worker in list(self._workers.values()):
+            entry = {
+                "worker_id": worker.worker_id,
+                "alive": worker.process.is_alive(),
+                "models": sorted(worker.models),
+            }
+            try:
+                entry.update(await self._call(worker, "status"))
+            except WorkerGone:
+                entry["alive"] = False
+            workers.append(entry)
+        return workers
+
+
+worker_pool = WorkerPool(NUM_WORKERS, MODEL_REPLICAS, MODEL_WATCH_INTERVAL)
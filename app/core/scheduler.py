@@ -0,0 +1,167 @@
+import json
+import time
+import asyncio
+
+from pathlib import Path
+from collections import deque
+from functools import lru_cache
+
+from ..config import MODELS_DIR, PRIORITY_WEIGHTS, SCHEDULER_CONCURRENCY
+from ..inference import canonical_model_name
+
+DEFAULT_PRIORITY = "normal"
+
+
+@lru_cache(maxsize=256)
+def _configured_priority(metadata_file, mtime):
+    # mtime is part of the cache key so edits to model.json are picked up
+    try:
+        with open(metadata_file) as f:
+            return json.load(f).get("priority")
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def resolve_priority(model_name, requested=None):
+    """
+    Pick the priority for a request: the `X-Priority` header if given,
+    else the "priority" key of the model's model.json, else "normal".
+
+    Raises:
+        ValueError: If the priority is not one of PRIORITY_WEIGHTS.
+    """
+    priority = requested
+    if priority is None:
+        metadata_file = MODELS_DIR / Path(model_name).parent / "model.json"
+        if metadata_file.exists():
+            priority = _configured_priority(
+                str(metadata_file), metadata_file.stat().st_mtime
+            )
+    priority = (priority or DEFAULT_PRIORITY).lower()
+
+    if priority not in PRIORITY_WEIGHTS:
+        raise ValueError(
+            f"Unknown priority {priority}, expected one of {list(PRIORITY_WEIGHTS)}"
+        )
+    return priority
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Lane:
+    """Queue of pending jobs for one (model, priority) pair."""
+
+    def __init__(self, model_name, priority, weight, window=1000):
+        self.model_name = model_name
+        self.priority = priority
+        self.weight = weight
+        self.queue = deque()
+        self.finish_time = 0.0
+        self.dispatched = 0
+        self.waits = deque(maxlen=window)
+
+    def describe(self):
+        entry = {
+            "model": self.model_name,
+            "priority": self.priority,
+            "weight": self.weight,
+            "queued": len(self.queue),
+            "dispatched": self.dispatched,
+        }
+        if self.waits:
+            entry["queue_ms_p50"] = round(_percentile(self.waits, 0.5) * 1000, 3)
+            entry["queue_ms_p99"] = round(_percentile(self.waits, 0.99) * 1000, 3)
+        return entry
+
+
+class Scheduler:
+    """
+    Weighted fair scheduler in front of the inference executor.
+
+    Every (model, priority) pair has its own lane, and at most `concurrency`
+    jobs run at once. When a slot frees up, the backlogged lane with the
+    smallest virtual finish time goes next. Each dispatch advances a lane by
+    1 / weight. A backlogged lane therefore gets at least
+    weight / sum(weights of backlogged lanes) of the slots, whatever the
+    other lanes have queued. A burst for one model cannot starve another
+    model or a higher priority.
+    """
+
+    def __init__(self, concurrency, weights):
+        self.concurrency = concurrency
+        self.weights = weights
+
+        self._lanes = {}
+        self._running = 0
+        self._virtual_time = 0.0
+        self._tasks = set()
+
+    def _lane(self, model_name, priority):
+        # One lane per model file, however its path is spelled
+        model_name = canonical_model_name(model_name)
+        key = (model_name, priority)
+        if key not in self._lanes:
+            self._lanes[key] = Lane(model_name, priority, self.weights[priority])
+        return self._lanes[key]
+
+    async def submit(self, model_name, priority, fn, *args):
+        """
+        Queue `await fn(*args)` on the lane for `model_name` and `priority`
+        and return its result once it has been scheduled and run.
+        """
+        lane = self._lane(model_name, priority)
+        if not lane.queue:
+            # An idle lane does not bank credit while it has nothing queued
+            lane.finish_time = max(lane.finish_time, self._virtual_time)
+
+        future = asyncio.get_running_loop().create_future()
+        lane.queue.append((time.perf_counter(), future, fn, args))
+        self._dispatch()
+        return await future
+
+    def _dispatch(self):
+        while self._running < self.concurrency:
+            backlogged = [lane for lane in self._lanes.values() if lane.queue]
+            if not backlogged:
+                return
+
+            lane = min(backlogged, key=lambda lane: lane.finish_time)
+            self._virtual_time = lane.finish_time
+            lane.finish_time += 1 / lane.weight
+
+            enqueued, future, fn, args = lane.queue.popleft()
+            if future.done():
+                # The caller went away while queued
+                continue
+            lane.waits.append(time.perf_counter() - enqueued)
+            lane.dispatched += 1
+
+            self._running += 1
+            task = asyncio.create_task(self._run(future, fn, args))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, future, fn, args):
+        try:
+            result = await fn(*args)
+            if not future.done():
+                future.set_result(result)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        finally:
+            self._running -= 1
+            self._dispatch()
+
+    def status(self):
+        return {
+            "concurrency": self.concurrency,
+            "running": self._running,
+            "lanes": [lane.describe() for lane in self._lanes.values()],
+        }
+
+
+scheduler = Scheduler(SCHEDULER_CONCURRENCY, PRIORITY_WEIGHTS)
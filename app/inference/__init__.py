@@ -1,3 +1,21 @@
-from .model_inference import content_to_class
+from .model_inference import (
+    canonical_model_name,
+    content_to_class,
+    contents_to_output,
+    contents_to_top_k,
+    resolve_model_path,
+    sibling_versions,
+)
+from .session_manager import session_manager
+from .postprocess import TENSOR_ENCODERS
 
-__all__ = ["content_to_class"]
+__all__ = [
+    "canonical_model_name",
+    "content_to_class",
+    "contents_to_output",
+    "contents_to_top_k",
+    "resolve_model_path",
+    "session_manager",
+    "sibling_versions",
+    "TENSOR_ENCODERS",
+]
@@ -0,0 +1,156 @@
+import threading
+
+from contextlib import contextmanager
+
+import numpy as np
+
+ORT_TYPE_TO_NUMPY = {
+    "tensor(float)": np.float32,
+    "tensor(float16)": np.float16,
+    "tensor(double)": np.float64,
+    "tensor(int64)": np.int64,
+    "tensor(int32)": np.int32,
+    "tensor(int8)": np.int8,
+    "tensor(uint8)": np.uint8,
+    "tensor(bool)": np.bool_,
+}
+
+
+def _resolve_shape(shape, batch_size):
+    """Replace the batch dimension with `batch_size`, None for any other dynamic dim."""
+    resolved = [batch_size]
+    for dim in shape[1:]:
+        resolved.append(dim if isinstance(dim, int) else None)
+    return resolved
+
+
+def _numpy_dtype(node):
+    """The numpy dtype to preallocate for an input or output node."""
+    if node.type not in ORT_TYPE_TO_NUMPY:
+        raise ValueError(f"{node.name} has unsupported type {node.type}")
+    return ORT_TYPE_TO_NUMPY[node.type]
+
+
+class BufferSet:
+    """
+    Preallocated input and output arrays for one batch size, bound once to an
+    ONNX Runtime IOBinding so that running the session allocates nothing.
+
+    `canvas` is a uint8 HWC scratch image that preprocessing letterboxes into
+    before writing the normalised result into a slot of `input`.
+    """
+
+    def __init__(self, session, batch_size):
+        self.batch_size = batch_size
+        self.binding = session.io_binding()
+
+        node = session.get_inputs()[0]
+        shape = _resolve_shape(node.shape, batch_size)
+        if None in shape:
+            raise ValueError(f"Input {node.name} has dynamic dimensions {node.shape}")
+        self.input = np.zeros(shape, dtype=_numpy_dtype(node))
+        self.binding.bind_input(
+            node.name,
+            "cpu",
+            0,
+            self.input.dtype,
+            self.input.shape,
+            self.input.ctypes.data,
+        )
+
+        self.canvas = None
+        if self.input.ndim == 4:
+            _, channels, height, width = self.input.shape
+            self.canvas = np.zeros((height, width, channels), dtype=np.uint8)
+
+        self.outputs = []
+        self._dynamic_outputs = []
+        for i, node in enumerate(session.get_outputs()):
+            shape = _resolve_shape(node.shape, batch_size)
+            if None in shape:
+                # Unknown size: let ONNX Runtime allocate it on every run
+                self.binding.bind_output(node.name, "cpu")
+                self.outputs.append(None)
+                self._dynamic_outputs.append(i)
+                continue
+            output = np.empty(shape, dtype=_numpy_dtype(node))
+            self.binding.bind_output(
+                node.name,
+                "cpu",
+                0,
+                output.dtype,
+                output.shape,
+                output.ctypes.data,
+            )
+            self.outputs.append(output)
+
+    @property
+    def output(self):
+        return self.outputs[0]
+
+    def run(self, session):
+        """
+        Run the session on `input`, writing results into the pooled outputs.
+
+        Returns:
+            np.ndarray: The first output, only valid until the lease is returned.
+        """
+        session.run_with_iobinding(self.binding)
+        if self._dynamic_outputs:
+            fetched = self.binding.get_outputs()
+            for i in self._dynamic_outputs:
+                self.outputs[i] = fetched[i].numpy()
+        return self.output
+
+
+class BufferPool:
+    """
+    Per-session pool of BufferSets, one free list per configured batch size.
+
+    A lease hands out a free set of the smallest batch size that fits the
+    request, creating one only when every set of that size is in use. In
+    steady state each request reuses buffers from an earlier one.
+    """
+
+    def __init__(self, session, batch_sizes):
+        self.session = session
+
+        batch_dim = session.get_inputs()[0].shape[0]
+        if isinstance(batch_dim, int):
+            # The model has a fixed batch size, nothing else can be bound
+            batch_sizes = [batch_dim]
+        self.batch_sizes = sorted(set(batch_sizes))
+
+        self._lock = threading.Lock()
+        self._free = {size: [] for size in self.batch_sizes}
+
+        # Fail early if the model cannot be bound to static buffers
+        self._free[self.batch_sizes[0]].append(BufferSet(session, self.batch_sizes[0]))
+
+    def _size_for(self, batch_size):
+        for size in self.batch_sizes:
+            if size >= batch_size:
+                return size
+        raise ValueError(
+            f"Batch of {batch_size} exceeds the largest configured batch size "
+            f"{self.batch_sizes[-1]}"
+        )
+
+    @contextmanager
+    def lease(self, batch_size=1):
+        """
+        Yield a BufferSet with room for at least `batch_size` items.
+        Unused trailing slots of its input are left as they were.
+        """
+        size = self._size_for(batch_size)
+        with self._lock:
+            free = self._free[size]
+            buffers = free.pop() if free else None
+        if buffers is None:
+            buffers = BufferSet(self.session, size)
+
+        try:
+            yield buffers
+        finally:
+            with self._lock:
+                self._free[size].append(buffers)
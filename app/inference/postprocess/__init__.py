@@ -1,3 +1,12 @@
 from .to_class import probability_to_class
+from .top_k import top_k, build_label_table, lookup_labels
+from .encode import TENSOR_ENCODERS, encode_tensor
 
-__all__ = ["probability_to_class"]
+__all__ = [
+    "probability_to_class",
+    "top_k",
+    "build_label_table",
+    "lookup_labels",
+    "TENSOR_ENCODERS",
+    "encode_tensor",
+]
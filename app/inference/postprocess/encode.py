@@ -0,0 +1,52 @@
+import io
+
+import numpy as np
+
+try:
+    import msgpack
+except ModuleNotFoundError:
+    msgpack = None
+
+
+def to_octet_stream(array):
+    """Raw C-order tensor bytes; shape and dtype travel in response headers."""
+    return np.ascontiguousarray(array).tobytes()
+
+
+def to_npy(array):
+    """
+    Encode the tensor in the .npy format, readable with `np.load`.
+    The data is copied once, straight from `array` into the response body.
+    """
+    array = np.ascontiguousarray(array)
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(
+        header, np.lib.format.header_data_from_array_1_0(array)
+    )
+    return b"".join([header.getvalue(), array.data])
+
+
+def to_msgpack(array):
+    """Encode the tensor as a msgpack map of dtype, shape and raw bytes."""
+    array = np.ascontiguousarray(array)
+    return msgpack.packb(
+        {"dtype": array.dtype.str, "shape": list(array.shape), "data": array.data}
+    )
+
+
+TENSOR_ENCODERS = {
+    "application/octet-stream": to_octet_stream,
+    "application/x-npy": to_npy,
+}
+if msgpack is not None:
+    TENSOR_ENCODERS["application/msgpack"] = to_msgpack
+
+
+def encode_tensor(array, media_type):
+    """
+    Encode an output tensor for `media_type`.
+
+    Returns:
+        tuple: (body bytes, shape, dtype name)
+    """
+    return TENSOR_ENCODERS[media_type](array), list(array.shape), array.dtype.name
@@ -1,14 +1,17 @@
-from numpy import argmax
+import numpy as np
 
 
 def probability_to_class(probabilities):
     """
-    Convert a list of probabilities to the class with the highest probability.
+    Convert probabilities to the class with the highest probability, per row.
 
     Args:
-        probabilities (np.ndarray): A list of probabilities.
+        probabilities (np.ndarray): Probabilities of shape (C,) or (N, C).
 
     Returns:
-
+        np.ndarray: The class index of each row, of shape () or (N,).
+            -1 if there are no probabilities.
     """
-    return int(argmax(probabilities)) if probabilities is not None else -1
+    if probabilities is None:
+        return np.array(-1)
+    return np.asarray(np.argmax(probabilities, axis=-1))
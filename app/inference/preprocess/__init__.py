@@ -1,9 +1,12 @@
-from .pad_resize import pad_to_size, make_landscape, resize_longest_edge
+from .pad_resize import pad_to_size, make_landscape, resize_longest_edge, letterbox_into
 from .channels_first import make_channels_first
+from .normalize import normalize_channels_first
 
 __all__ = [
     "pad_to_size",
     "make_landscape",
     "resize_longest_edge",
     "make_channels_first",
+    "letterbox_into",
+    "normalize_channels_first",
 ]
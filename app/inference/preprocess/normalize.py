@@ -0,0 +1,19 @@
+import numpy as np
+
+
+def normalize_channels_first(image, out, mean=0.5, std=0.5):
+    """
+    Write a uint8 HWC image into a float CHW array as ((pixel / 255) - mean) / std.
+    Both steps are done in place on `out`, so no intermediate arrays are allocated.
+
+    Args:
+        image (np.ndarray): Input image in HWC format.
+        out (np.ndarray): Destination CHW array, e.g. one slot of a pooled batch.
+
+    Returns:
+        np.ndarray: `out`.
+    """
+    scale = out.dtype.type(1.0 / (255.0 * std))
+    np.multiply(image.transpose(2, 0, 1), scale, out=out, dtype=out.dtype)
+    np.subtract(out, out.dtype.type(mean / std), out=out)
+    return out
@@ -56,3 +56,31 @@ def pad_to_size(image, target_size):
     )
 
     return padded_image
+
+
+def letterbox_into(image, canvas):
+    """
+    Resize the image so its longest edge fits `canvas` and write it centered
+    into `canvas` with zero padding, without allocating the padded image.
+    Same result as `resize_longest_edge` followed by `pad_to_size`.
+    """
+    height, width = image.shape[:2]
+    target_height, target_width = canvas.shape[:2]
+    if height / target_height > width / target_width:
+        new_height = target_height
+        new_width = int((target_height / height) * width)
+    else:
+        new_width = target_width
+        new_height = int((target_width / width) * height)
+
+    top = (target_height - new_height) // 2
+    left = (target_width - new_width) // 2
+
+    canvas.fill(0)
+    cv2.resize(
+        image,
+        (new_width, new_height),
+        dst=canvas[top : top + new_height, left : left + new_width],
+        interpolation=cv2.INTER_LINEAR,
+    )
+    return canvas
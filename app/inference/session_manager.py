@@ -0,0 +1,382 @@
+import os
+import time
+import atexit
+import shutil
+import tempfile
+import threading
+
+from contextlib import contextmanager
+
+import numpy as np
+import onnxruntime as ort
+
+from ..config import logger, INFERENCE_BATCH_SIZES
+from .buffer_pool import BufferPool, ORT_TYPE_TO_NUMPY
+
+
+def snapshot_model(source_path, snapshot_dir):
+    """
+    Copy a model file into `snapshot_dir` together with the files beside it,
+    so that external-data files it references by relative path are copied too.
+    Other .onnx models in the same directory are skipped.
+
+    Returns:
+        str: Path of the copied model file.
+    """
+    source_dir, name = os.path.split(source_path)
+    for entry in os.scandir(source_dir):
+        if not entry.is_file():
+            continue
+        if entry.name == name or not entry.name.endswith(".onnx"):
+            shutil.copyfile(entry.path, os.path.join(snapshot_dir, entry.name))
+    return os.path.join(snapshot_dir, name)
+
+
+class ModelVersion:
+    """
+    A built and warmed ONNX Runtime session for one version of a model file.
+
+    The session is built from a copy of the model in `snapshot_dir`, so the
+    version can be rebuilt on rollback after the file has been replaced,
+    without keeping a second copy of the model in memory.
+    """
+
+    def __init__(self, model_path, source_path, snapshot_dir, mtime, version):
+        self.model_path = model_path
+        self.mtime = mtime
+        self.version = version
+        self.loaded_at = time.time()
+
+        self.snapshot_path = snapshot_model(source_path, snapshot_dir)
+        self.session = ort.InferenceSession(self.snapshot_path)
+        self.input_name = self.session.get_inputs()[0].name
+
+        try:
+            self.buffers = BufferPool(self.session, INFERENCE_BATCH_SIZES)
+        except ValueError as e:
+            logger.warning(f"Running {model_path} without pooled buffers: {e}")
+            self.buffers = None
+
+        self.refcount = 0
+        self.retired = False
+
+    def warm_up(self):
+        """
+        Run a single inference on zero-filled inputs so that the first real
+        request does not pay for lazy kernel initialisation.
+
+        With pooled buffers this runs once per batch size, which also leaves a
+        bound BufferSet ready for each. Otherwise dynamic dimensions are set to 1.
+        """
+        if self.buffers is not None:
+            for size in self.buffers.batch_sizes:
+                with self.buffers.lease(size) as buffers:
+                    buffers.run(self.session)
+            return
+
+        feeds = {}
+        for node in self.session.get_inputs():
+            shape = [dim if isinstance(dim, int) else 1 for dim in node.shape]
+            dtype = ORT_TYPE_TO_NUMPY.get(node.type, np.float32)
+            feeds[node.name] = np.zeros(shape, dtype=dtype)
+        self.session.run(None, feeds)
+
+    def release(self):
+        """Drop the session so ONNX Runtime can free its memory."""
+        self.session = None
+        self.buffers = None
+        logger.info(f"Released {self.model_path} version {self.version}")
+
+    def describe(self):
+        return {
+            "model_path": self.model_path,
+            "version": self.version,
+            "mtime": self.mtime,
+            "loaded_at": self.loaded_at,
+            "in_flight": self.refcount,
+            "batch_sizes": self.buffers.batch_sizes if self.buffers else None,
+        }
+
+
+class SessionManager:
+    """
+    Keeps one live ONNX Runtime session per model file and swaps in new
+    versions without interrupting in-flight requests.
+
+    Requests hold a reference to the version they started on; a swapped-out
+    version is retired and released once its last request has finished.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._versions = {}
+        self._previous = {}
+        # File mtime as of the last swap, so a rollback is not undone by the watcher
+        self._seen_mtime = {}
+
+        self._snapshot_dir = None
+        self._snapshot_count = 0
+
+        self._watcher = None
+        self._stop_event = threading.Event()
+
+    def _load_lock(self, model_path):
+        with self._lock:
+            return self._load_locks.setdefault(model_path, threading.Lock())
+
+    def _new_snapshot_dir(self):
+        with self._lock:
+            if self._snapshot_dir is None:
+                self._snapshot_dir = tempfile.mkdtemp(prefix="serve-ml-snapshots-")
+                atexit.register(shutil.rmtree, self._snapshot_dir, True)
+            self._snapshot_count += 1
+            snapshot_dir = os.path.join(self._snapshot_dir, str(self._snapshot_count))
+        os.mkdir(snapshot_dir)
+        return snapshot_dir
+
+    @staticmethod
+    def _discard(snapshot_path):
+        shutil.rmtree(os.path.dirname(snapshot_path), ignore_errors=True)
+
+    def _build(self, model_path, version, source_path=None, mtime=None):
+        """Snapshot and load `source_path` (the model file by default), then warm it."""
+        if source_path is None:
+            source_path = model_path
+            mtime = os.path.getmtime(model_path)
+
+        snapshot_dir = self._new_snapshot_dir()
+        try:
+            model_version = ModelVersion(
+                model_path, source_path, snapshot_dir, mtime, version
+            )
+            model_version.warm_up()
+        except Exception:
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+            raise
+        return model_version
+
+    def _swap(self, model_path, new_version, seen_mtime):
+        with self._lock:
+            old_version = self._versions.get(model_path)
+            self._versions[model_path] = new_version
+            self._seen_mtime[model_path] = seen_mtime
+            if old_version is None:
+                return
+            evicted = self._previous.get(model_path)
+            self._previous[model_path] = old_version.snapshot_path, old_version.mtime
+            old_version.retired = True
+            free = old_version.refcount == 0
+
+        if evicted is not None:
+            self._discard(evicted[0])
+        logger.info(
+            f"Swapped {model_path} version {old_version.version} "
+            f"-> {new_version.version}"
+        )
+        if free:
+            old_version.release()
+
+    def _next_version(self, model_path):
+        with self._lock:
+            current = self._versions.get(model_path)
+        return current.version + 1 if current else 1
+
+    @contextmanager
+    def acquire(self, model_path):
+        """
+        Yield the current version of a model, loading it on first use.
+        The version stays alive until the block exits, even if it is swapped out.
+        """
+        model_path = str(model_path)
+
+        with self._lock:
+            model_version = self._versions.get(model_path)
+            if model_version is not None:
+                model_version.refcount += 1
+
+        if model_version is None:
+            with self._load_lock(model_path):
+                with self._lock:
+                    model_version = self._versions.get(model_path)
+                if model_version is None:
+                    logger.info(f"Loading {model_path}")
+                    new_version = self._build(model_path, 1)
+                    self._swap(model_path, new_version, new_version.mtime)
+                with self._lock:
+                    model_version = self._versions[model_path]
+                    model_version.refcount += 1
+
+        try:
+            yield model_version
+        finally:
+            with self._lock:
+                model_version.refcount -= 1
+                free = model_version.retired and model_version.refcount == 0
+            if free:
+                model_version.release()
+
+    def reload(self, model_path):
+        """
+        Build and warm a new session from the file on disk, then swap it in.
+
+        Returns:
+            int: The new version number.
+        """
+        model_path = str(model_path)
+        with self._load_lock(model_path):
+            new_version = self._build(model_path, self._next_version(model_path))
+            self._swap(model_path, new_version, new_version.mtime)
+        return new_version.version
+
+    def rollback(self, model_path):
+        """
+        Swap back to the version that was live before the last swap.
+        Rolling back twice returns to the newer version.
+
+        Returns:
+            int: The new version number.
+        """
+        model_path = str(model_path)
+        with self._load_lock(model_path):
+            with self._lock:
+                previous = self._previous.get(model_path)
+            if previous is None:
+                raise ValueError(f"No previous version of {model_path} to roll back to")
+
+            snapshot_path, mtime = previous
+            new_version = self._build(
+                model_path, self._next_version(model_path), snapshot_path, mtime
+            )
+            # The file on disk still holds the newer version: only a later
+            # change to it should trigger a reload
+            self._swap(model_path, new_version, os.path.getmtime(model_path))
+        return new_version.version
+
+    def can_rollback(self, model_path):
+        with self._lock:
+            return str(model_path) in self._previous
+
+    def export(self, model_path):
+        """
+        Describe a loaded model so another process can adopt it as it is,
+        including a rolled-back version and its rollback target.
+        Returns None if the model is not loaded.
+        """
+        model_path = str(model_path)
+        with self._lock:
+            model_version = self._versions.get(model_path)
+            if model_version is None:
+                return None
+            return {
+                "snapshot_path": model_version.snapshot_path,
+                "mtime": model_version.mtime,
+                "version": model_version.version,
+                "seen_mtime": self._seen_mtime[model_path],
+                "previous": self._previous.get(model_path),
+            }
+
+    def adopt(self, model_path, exported):
+        """
+        Load a model from another process's `export`, copying its snapshots so
+        the exporting process can unload it afterwards.
+
+        Returns:
+            int: The adopted version number.
+        """
+        model_path = str(model_path)
+        with self._load_lock(model_path):
+            new_version = self._build(
+                model_path,
+                exported["version"],
+                exported["snapshot_path"],
+                exported["mtime"],
+            )
+
+            previous = None
+            if exported["previous"] is not None:
+                snapshot_path, mtime = exported["previous"]
+                previous = (
+                    snapshot_model(snapshot_path, self._new_snapshot_dir()),
+                    mtime,
+                )
+
+            self._swap(model_path, new_version, exported["seen_mtime"])
+            with self._lock:
+                replaced = self._previous.pop(model_path, None)
+                if previous is not None:
+                    self._previous[model_path] = previous
+            if replaced is not None:
+                self._discard(replaced[0])
+        return new_version.version
+
+    def unload(self, model_path):
+        """
+        Stop serving a model and drop its rollback snapshot.
+        The session is released once its in-flight requests have finished.
+        """
+        model_path = str(model_path)
+        with self._load_lock(model_path):
+            with self._lock:
+                model_version = self._versions.pop(model_path, None)
+                previous = self._previous.pop(model_path, None)
+                self._seen_mtime.pop(model_path, None)
+                if model_version is None:
+                    return
+                model_version.retired = True
+                free = model_version.refcount == 0
+
+        # The sessions are already built, so their snapshots can go right away
+        self._discard(model_version.snapshot_path)
+        if previous is not None:
+            self._discard(previous[0])
+
+        logger.info(f"Unloaded {model_path} version {model_version.version}")
+        if free:
+            model_version.release()
+
+    def reload_changed(self):
+        """Reload every loaded model whose file has changed since its last swap."""
+        with self._lock:
+            loaded = dict(self._seen_mtime)
+
+        for model_path, mtime in loaded.items():
+            try:
+                if os.path.getmtime(model_path) == mtime:
+                    continue
+                logger.info(f"Detected update to {model_path}, reloading")
+                self.reload(model_path)
+            except Exception as e:
+                # Keep serving the current version if the new file is unusable
+                logger.error(f"Failed to reload {model_path}: {e}")
+
+    def status(self):
+        with self._lock:
+            return [
+                {**v.describe(), "can_rollback": path in self._previous}
+                for path, v in self._versions.items()
+            ]
+
+    def _watch(self, interval):
+        while not self._stop_event.wait(interval):
+            self.reload_changed()
+
+    def start_watcher(self, interval):
+        """Poll loaded model files every `interval` seconds in a background thread."""
+        if self._watcher is not None:
+            return
+        self._stop_event.clear()
+        self._watcher = threading.Thread(
+            target=self._watch, args=(interval,), name="model-watcher", daemon=True
+        )
+        self._watcher.start()
+
+    def stop_watcher(self):
+        if self._watcher is None:
+            return
+        self._stop_event.set()
+        self._watcher.join()
+        self._watcher = None
+
+
+session_manager = SessionManager()
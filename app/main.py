@@ -8,15 +8,17 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.responses import FileResponse
 
-from .api import health, predict, registry
-from .core import RequestLoggingMiddleware
+from .api import admin, health, predict, registry
+from .core import RequestLoggingMiddleware, worker_pool
 from .config import logger, ASSETS_DIR, PROJ_ROOT
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("🚀 FastAPI application starting...")
+    worker_pool.start()
     yield
+    worker_pool.stop()
     logger.info("🛑 FastAPI application shutting down...")
 
 
@@ -31,6 +33,7 @@ app.add_middleware(RequestLoggingMiddleware)
 app.include_router(registry.router)
 app.include_router(predict.router)
 app.include_router(health.router)
+app.include_router(admin.router)
 
 
 #########################################